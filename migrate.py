@@ -1,26 +1,90 @@
 import argparse
-import chardet
+import codecs
 import csv
 import os
 import sys
-import yaml
 import re
+import tempfile
+from collections import Counter, deque
+from contextlib import nullcontext
+from functools import lru_cache
+from itertools import islice
 
-MIN_PYTHON = (3, 10, 0)
-if sys.version_info < MIN_PYTHON:
-    sys.exit(f"Python {MIN_PYTHON[0]}.{MIN_PYTHON[1]}.{MIN_PYTHON[2]} or later is required.\n")
+if sys.version_info[:2] < (3, 10):
+    sys.exit("Python 3.10 or later is required.\n")
 
 # List of reserved tag names that need to be prefixed with 'sw_'
 RESERVED_TAGS = {'host', 'device', 'source', 'service', 'env', 'version', 'team'}
 
+# Mapping of reserved tag names to their prefixed replacement
+RESERVED_TAG_REMAP = {tag: 'sw_' + tag for tag in RESERVED_TAGS}
+
 # Default columns to use for tags
 DEFAULT_TAG_COLUMNS = 'Caption,Location'
 
+# Number of rows handed to a worker process at a time when running with --jobs
+ROW_CHUNK_SIZE = 5000
+
+# init_config section of the generated configuration
+INIT_CONFIG = {
+    'loader': 'core',
+    'use_device_id_as_hostname': True
+}
+
+# Matches a run of characters not allowed in tags. Underscores are included in
+# the run so that existing underscores collapse together with replaced characters.
+_TAG_INVALID_RUN = re.compile(r'[^a-zA-Z0-9\-:./]+')
+
+# Strings matching this can be written as plain YAML scalars, as long as they don't
+# end with a colon and YAML doesn't resolve them to another type (e.g. yes, null, 1:20)
+PLAIN_SCALAR = re.compile(r'[a-zA-Z0-9_/][a-zA-Z0-9_\-:./]*')
+
+# Unicode categories of the non-printable characters removed from values: control
+# and format characters (e.g. BOM, zero width space), and line, paragraph and space
+# separators. This is what str.isprintable() rejects, apart from the ASCII space and
+# unassigned, private use and surrogate code points.
+NON_PRINTABLE_CATEGORIES = {'Cc', 'Cf', 'Zl', 'Zp', 'Zs'}
+
+# Byte order marks and the encoding to read them with. UTF-32 is checked before
+# UTF-16 since the UTF-32 LE BOM starts with the UTF-16 LE BOM.
+BOM_ENCODINGS = (
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+def positive_int(value):
+    """Argument type for integers greater than zero."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid integer value: '{value}'")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+def encoding_name(value):
+    """Argument type for encoding names known to Python."""
+    try:
+        codecs.lookup(value)
+    except LookupError:
+        raise argparse.ArgumentTypeError(f"unknown encoding: '{value}'")
+    return value
+
 def parse_arguments():
     parser = argparse.ArgumentParser(description='Generate DataDog SNMP YAML configuration from SolarWinds CSV files (Individual instances format).')
     parser.add_argument('csv_file', type=str, help='Path to the SolarWinds CSV file containing node data.')
     parser.add_argument('-o', '--output', type=str, help='Optional path to write the YAML configuration file. If omitted, prints to stdout.')
 
+    parser.add_argument('-e', '--encoding', type=encoding_name,
+                        help='Encoding of the CSV file (e.g. utf-8, windows-1252). If omitted, the encoding is detected automatically.')
+    parser.add_argument('-j', '--jobs', type=positive_int, default=1,
+                        help='Number of worker processes used to convert rows. Defaults to 1 (no worker processes).')
+    parser.add_argument('--safe-yaml', action='store_true',
+                        help='Write instances with the YAML library instead of the built-in writer.')
+
     parser.add_argument('-t', '--tag-columns', type=str, default=DEFAULT_TAG_COLUMNS,
                         help='Comma-separated list of CSV columns to use for tags. Format: column1:tag1,column2:tag2. If tag name not specified, column name in lowercase is used.')
 
@@ -33,115 +97,150 @@ def parse_arguments():
     return parser.parse_args()
 
 def detect_encoding(file_path, sample_size=32768):
-    """Detect the encoding of a file using chardet."""
-    print(f"Attempting to detect encoding for {file_path} using chardet...")
+    """Detect the encoding of a file, using chardet only if there is no BOM and the sample isn't ASCII."""
     try:
         with open(file_path, 'rb') as f:
             raw_data = f.read(sample_size)
 
+        for bom, encoding in BOM_ENCODINGS:
+            if raw_data.startswith(bom):
+                print(f"Detected byte order mark for {file_path}, reading as {encoding}.", file=sys.stderr)
+                return encoding
+
+        # UTF-16/32 text without a BOM is also all bytes < 0x80, but contains NULs
+        if raw_data.isascii() and b'\x00' not in raw_data:
+            print(f"Sample of {file_path} is ASCII, reading as utf-8 as it's a superset.", file=sys.stderr)
+            return 'utf-8'
+
+        # Imported here so files that skip detection don't pay for loading chardet
+        import chardet
+
+        print(f"Attempting to detect encoding for {file_path} using chardet...", file=sys.stderr)
         result = chardet.detect(raw_data)
         detected_encoding = result['encoding']
         confidence = result['confidence']
 
         if detected_encoding:
-            print(f"Chardet detected encoding: {detected_encoding} with confidence {confidence:.2f}")
+            print(f"Chardet detected encoding: {detected_encoding} with confidence {confidence:.2f}", file=sys.stderr)
             if detected_encoding.lower() == 'ascii':
-                 print("Chardet detected ASCII, will attempt reading as utf-8 as it's a superset.")
+                 print("Chardet detected ASCII, will attempt reading as utf-8 as it's a superset.", file=sys.stderr)
                  return 'utf-8'
             return detected_encoding
         else:
-            print("Chardet could not detect encoding confidently. Falling back to utf-8-sig.")
+            print("Chardet could not detect encoding confidently. Falling back to utf-8-sig.", file=sys.stderr)
             return 'utf-8-sig'
 
     except FileNotFoundError:
-        print(f"Error: File not found at {file_path}")
+        print(f"Error: File not found at {file_path}", file=sys.stderr)
         raise
     except Exception as e:
-        print(f"Error during encoding detection: {e}. Falling back to utf-8-sig.")
+        print(f"Error during encoding detection: {e}. Falling back to utf-8-sig.", file=sys.stderr)
         return 'utf-8-sig'
 
+@lru_cache(maxsize=None)
+def get_non_printable_chars():
+    """Build the translation table removing non-printable characters from values.
+
+    Built from the Unicode database of the running Python on first use, since
+    scanning every code point takes a noticeable fraction of a second.
+    """
+    import unicodedata
+
+    return dict.fromkeys(
+        code_point for code_point in range(sys.maxunicode + 1)
+        if code_point != 0x20 and unicodedata.category(chr(code_point)) in NON_PRINTABLE_CATEGORIES
+    )
+
 def sanitize_value(value):
-    """Sanitize a single value by removing or replacing invalid characters."""
+    """Sanitize a single value by removing non-printable characters."""
     if value is None:
         return value
 
-    # Handle different types of values
-    if isinstance(value, (list, tuple)):
-        # Convert list/tuple to string representation
-        value = str(value)
-    elif not isinstance(value, str):
-        # Convert other types to string
+    # Convert other types (including lists/tuples from extra row fields) to string
+    if not isinstance(value, str):
         value = str(value)
 
-    try:
-        # First try to encode as latin1 and decode as UTF-8
-        return value.encode('latin1').decode('utf-8', errors='replace')
-    except (UnicodeEncodeError, UnicodeDecodeError):
-        # If that fails, try to clean the string
-        try:
-            # Remove any non-printable characters
-            return ''.join(char for char in value if char.isprintable())
-        except Exception:
-            # If all else fails, return empty string
-            return ''
-
-def read_csv_file(file_path):
-    """Read, sanitize, and parse the SolarWinds CSV file."""
-    configs = []
-    device_types = {}
-    total_rows = 0
+    # Pure ASCII values (the common case) need no further work
+    if value.isascii():
+        return value
+
+    # The CSV reader has already decoded the value, so only strip non-printable characters
+    return value.translate(get_non_printable_chars())
 
-    # Detect encoding first
-    file_encoding = detect_encoding(file_path)
+def get_column(row, index):
+    """Return the value at the given column index of a CSV row, or None if the row doesn't have it."""
+    if index is None or index >= len(row):
+        return None
+    return row[index]
+
+def iter_csv_rows(file_path, file_encoding):
+    """Read and parse the SolarWinds CSV file lazily.
+
+    The first item yielded is a mapping of sanitized column names to their index
+    in each row, followed by the SNMP rows as lists of values.
+    """
+    device_types = Counter()
+    total_rows = 0
 
     try:
         with open(file_path, newline='', encoding=file_encoding) as csvfile:
-            csvreader = csv.DictReader(csvfile)
+            csvreader = csv.reader(csvfile)
 
-            # Sanitize fieldnames if they exist
-            if csvreader.fieldnames:
-                # Ensure fieldnames are strings before sanitizing
-                safe_fieldnames = [str(fieldname) if fieldname is not None else '' for fieldname in csvreader.fieldnames]
-                sanitized_fieldnames = [sanitize_value(fieldname) for fieldname in safe_fieldnames]
-                csvreader.fieldnames = sanitized_fieldnames
+            # Map sanitized fieldnames to their column index once
+            header = next(csvreader, [])
+            columns = {sanitize_value(fieldname): index for index, fieldname in enumerate(header)}
+            device_type_index = columns.get('ObjectSubType')
+            yield columns
 
-            for row_dict in csvreader:
-                total_rows += 1
-                sanitized_row = {}
-                if row_dict is None:
-                    print(f"Warning: Skipping empty row {total_rows+1}")
+            for row in csvreader:
+                # Skip blank lines
+                if not row:
                     continue
+                total_rows += 1
 
-                for key, value in row_dict.items():
-                     # Sanitize key (ensure it's a string first)
-                    sanitized_key = sanitize_value(str(key)) if key is not None else None
-                    # Sanitize value (sanitize_value already handles None/types)
-                    sanitized_row[sanitized_key] = sanitize_value(value)
-
-                # Track device types using sanitized data
-                device_type = sanitized_row.get('ObjectSubType', 'Unknown')
-                device_types[device_type] = device_types.get(device_type, 0) + 1
+                # Values are sanitized lazily, only for the columns that are actually consumed
+                if device_type_index is None:
+                    device_type = 'Unknown'
+                else:
+                    device_type = sanitize_value(get_column(row, device_type_index))
+                device_types[device_type] += 1
                 if device_type == 'SNMP':
-                    configs.append(sanitized_row) # Add the fully sanitized row
+                    yield row
 
     except UnicodeDecodeError as e:
-         print(f"\nError: Failed to decode {file_path} using detected encoding '{file_encoding}'.")
-         print(f"Try checking the file's actual encoding or manually specifying it if known.")
-         print(f"Specific error: {e}")
+         print(f"\nError: Failed to decode {file_path} using encoding '{file_encoding}'.", file=sys.stderr)
+         print(f"Try checking the file's actual encoding or specifying it with -e/--encoding if known.", file=sys.stderr)
+         print(f"Specific error: {e}", file=sys.stderr)
          raise
     except FileNotFoundError:
-         print(f"Error: File not found at {file_path}")
+         print(f"Error: File not found at {file_path}", file=sys.stderr)
          raise
     except Exception as e:
-         print(f"\nAn unexpected error occurred while reading {file_path}: {e}")
+         print(f"\nAn unexpected error occurred while reading {file_path}: {e}", file=sys.stderr)
          raise
 
-    print(f"Read and sanitized {total_rows} rows from CSV file with ObjectSubType:")
+    print(f"Read and sanitized {total_rows} rows from CSV file with ObjectSubType:", file=sys.stderr)
     for device_type, count in sorted(device_types.items()):
-        print(f"  - {device_type}: {count}")
+        print(f"  - {device_type}: {count}", file=sys.stderr)
 
-    return configs
+def read_csv_file(file_path, encoding=None):
+    """Open the SolarWinds CSV file and read its header.
 
+    If encoding is not given, it is detected from the file.
+
+    Returns an iterator over the SNMP rows as lists of values, along with a mapping
+    of sanitized column names to their index in each row. Rows are only read from
+    the file as the iterator is consumed.
+    """
+    # Detect encoding first, unless it was specified
+    file_encoding = encoding or detect_encoding(file_path)
+
+    rows = iter_csv_rows(file_path, file_encoding)
+    columns = next(rows)
+    return rows, columns
+
+# Tag values such as locations repeat across many rows, so cache the results
+@lru_cache(maxsize=4096)
 def sanitize_tag(text):
     """Sanitize tag key or value to only contain allowed characters."""
     if not text:
@@ -150,44 +249,63 @@ def sanitize_tag(text):
     # Convert to string if not already
     text = str(text)
     
-    # Replace any character that's not alphanumeric, underscore, minus, colon, period, or slash with underscore
-    sanitized = re.sub(r'[^a-zA-Z0-9_\-:./]', '_', text)
-    
-    # Remove any consecutive underscores
-    sanitized = re.sub(r'_+', '_', sanitized)
+    # Replace each run of characters that are not alphanumeric, minus, colon, period, or slash
+    # (including runs of underscores) with a single underscore
+    sanitized = _TAG_INVALID_RUN.sub('_', text)
     
     # Remove leading/trailing underscores
     sanitized = sanitized.strip('_')
     
     return sanitized
 
-def get_tags(row, tag_columns):
-    """Generate tags from device information using specified columns."""
-    tags = []
-    
-    # Parse tag columns specification
+def parse_tag_columns(tag_columns):
+    """Parse the tag columns specification into a list of (column name, tag name) tuples."""
+    parsed = []
     for col_spec in tag_columns.split(','):
         # Split on colon if tag name is specified
         parts = col_spec.split(':')
         col_name = parts[0].strip()
         tag_name = parts[1].strip().lower() if len(parts) > 1 else col_name.lower()
+        parsed.append((col_name, tag_name))
+    return parsed
+
+def build_tag_plan(tag_columns, columns):
+    """Resolve the tag columns specification against the CSV header.
+
+    Returns a list of (column index, tag name) tuples, where the tag name is
+    already sanitized and prefixed if reserved. Columns missing from the CSV and
+    tag names that are empty after sanitization are dropped.
+    """
+    tag_plan = []
+    for col_name, tag_name in parse_tag_columns(tag_columns):
+        if col_name not in columns:
+            continue
         
-        # Add tag if column exists and has value
-        if col_name in row and row[col_name]:
-            # Sanitize both the tag name and value
-            sanitized_tag = sanitize_tag(tag_name)
-            sanitized_value = sanitize_tag(row[col_name])
-            
-            # Add sw_ prefix if tag name is reserved
-            if sanitized_tag in RESERVED_TAGS:
-                sanitized_tag = f"sw_{sanitized_tag}"
-            
-            if sanitized_tag and sanitized_value:  # Only add if both parts are non-empty after sanitization
-                tags.append(f"{sanitized_tag}:{sanitized_value}")
+        sanitized_tag = sanitize_tag(tag_name)
+        
+        # Add sw_ prefix if tag name is reserved
+        sanitized_tag = RESERVED_TAG_REMAP.get(sanitized_tag, sanitized_tag)
+        
+        if sanitized_tag:
+            tag_plan.append((columns[col_name], sanitized_tag))
+    return tag_plan
+
+def get_tags(row, tag_plan):
+    """Generate tags from device information using a plan built by build_tag_plan."""
+    tags = []
+    
+    for col_index, tag_name in tag_plan:
+        value = sanitize_value(get_column(row, col_index))
+        
+        # Add tag if column has value
+        if value:
+            sanitized_value = sanitize_tag(value)
+            if sanitized_value:  # Only add if the value is non-empty after sanitization
+                tags.append(f"{tag_name}:{sanitized_value}")
     
     return tags
 
-def get_snmp_auth_config(row, snmp_version, snmpv3_user=None, snmpv3_authprotocol=None, snmpv3_privprotocol=None):
+def get_snmp_auth_config(snmp_version, snmpv3_user=None, snmpv3_authprotocol=None, snmpv3_privprotocol=None):
     """Get SNMP authentication configuration based on SNMP version."""
     if snmp_version in [1, 2]:
         return {
@@ -202,69 +320,194 @@ def get_snmp_auth_config(row, snmp_version, snmpv3_user=None, snmpv3_authprotoco
             'privKey': 'PLACEHOLDER_PRIVKEY'
         }
 
-def generate_multi_instance_config(configs, snmpv3_user=None, snmpv3_authprotocol=None, snmpv3_privprotocol=None, tag_columns=DEFAULT_TAG_COLUMNS):
-    """Generate a single Datadog YAML configuration file with multiple SNMP device instances."""
-    instances = []
-    skipped_rows = 0
+def parse_int(value, default=None):
+    """Parse a non-negative integer from a CSV value, returning default if it isn't one."""
+    if value:
+        value = value.strip()
+        if value.isdecimal():
+            return int(value)
+    return default
+
+def build_instance_plan(columns, tag_columns=DEFAULT_TAG_COLUMNS, snmpv3_user=None, snmpv3_authprotocol=None, snmpv3_privprotocol=None):
+    """Resolve the column indices, tags and SNMP authentication used to build instances once per CSV."""
+    return {
+        'ip_address': columns.get('IP_Address'),
+        'snmp_version': columns.get('SNMPVersion'),
+        'agent_port': columns.get('AgentPort'),
+        'poll_interval': columns.get('PollInterval'),
+        'tags': build_tag_plan(tag_columns, columns),
+        # Authentication only depends on the SNMP version, so it can be shared by all instances
+        'snmp_auth': {
+            snmp_version: get_snmp_auth_config(snmp_version, snmpv3_user, snmpv3_authprotocol, snmpv3_privprotocol)
+            for snmp_version in (1, 2, 3)
+        }
+    }
+
+def build_instance(row, plan):
+    """Build a Datadog SNMP device instance from a CSV row, or None if the row has no IP_Address."""
+    # Only the consumed values are sanitized
+    ip_address = sanitize_value(get_column(row, plan['ip_address']))
     
-    for row in configs:
-        # Skip rows without IP_Address
-        if 'IP_Address' not in row or not row['IP_Address']:
-            skipped_rows += 1
-            continue
-        
-        tags = get_tags(row, tag_columns)
-        
-        # Determine SNMP version from the CSV data
-        # Default to version 2 if not specified or invalid
+    # Skip rows without IP_Address
+    if not ip_address:
+        return None
+    
+    snmp_version_value = sanitize_value(get_column(row, plan['snmp_version']))
+    agent_port = sanitize_value(get_column(row, plan['agent_port']))
+    poll_interval = sanitize_value(get_column(row, plan['poll_interval']))
+    
+    tags = get_tags(row, plan['tags'])
+    
+    # Determine SNMP version from the CSV data
+    # Default to version 2 if not specified or invalid
+    snmp_version = parse_int(snmp_version_value)
+    if snmp_version not in (1, 2, 3):
         snmp_version = 2
-        if 'SNMPVersion' in row and row['SNMPVersion']:
-            try:
-                version = int(row['SNMPVersion'])
-                if version in [1, 2, 3]:
-                    snmp_version = version
-            except (ValueError, TypeError):
-                pass  # Keep the default if conversion fails
-        
-        snmp_auth = get_snmp_auth_config(row, snmp_version, snmpv3_user, snmpv3_authprotocol, snmpv3_privprotocol)
-        
-        # Check for valid PollInterval
-        min_collection_interval = None
-        if 'PollInterval' in row and row['PollInterval']:
-            try:
-                interval = int(row['PollInterval'])
-                if interval > 0:
-                    min_collection_interval = interval
-            except (ValueError, TypeError):
-                pass  # Skip invalid values
-        
-        instance = {
-            'ip_address': row['IP_Address'],
-            'port': int(row['AgentPort']) if row.get('AgentPort') is not None and row.get('AgentPort') != '' else 161,  # Default to 161 if not specified
-            'snmp_version': snmp_version,
-            **snmp_auth,
-            'tags': tags
-        }
-        
-        # Add min_collection_interval if we found a valid value
-        if min_collection_interval is not None:
-            instance['min_collection_interval'] = min_collection_interval
+    
+    # Check for valid PollInterval, skipping invalid and zero values
+    min_collection_interval = parse_int(poll_interval) or None
+    
+    instance = {
+        'ip_address': ip_address,
+        'port': parse_int(agent_port, 161),  # Default to 161 if not specified or invalid
+        'snmp_version': snmp_version,
+        **plan['snmp_auth'][snmp_version],
+        'tags': tags
+    }
+    
+    # Add min_collection_interval if we found a valid value
+    if min_collection_interval is not None:
+        instance['min_collection_interval'] = min_collection_interval
+    
+    return instance
+
+def build_instances(rows, plan):
+    """Build instances for a chunk of rows. Defined at module level so worker processes can run it."""
+    return [build_instance(row, plan) for row in rows]
+
+def build_instances_parallel(executor, rows, plan, max_pending):
+    """Build instances for rows in chunks on an executor, yielding them in row order.
+
+    At most max_pending chunks are submitted at a time, so rows are only read
+    from the CSV as the results are consumed.
+    """
+    pending = deque()
+    for chunk in iter(lambda: list(islice(rows, ROW_CHUNK_SIZE)), []):
+        pending.append(executor.submit(build_instances, chunk, plan))
+        if len(pending) >= max_pending:
+            yield from pending.popleft().result()
+    while pending:
+        yield from pending.popleft().result()
+
+def generate_instances(configs, columns, snmpv3_user=None, snmpv3_authprotocol=None, snmpv3_privprotocol=None, tag_columns=DEFAULT_TAG_COLUMNS, jobs=1):
+    """Generate Datadog SNMP device instances, one per CSV row, as the rows are consumed.
+
+    With jobs greater than 1, rows are converted in chunks by a pool of worker processes.
+    """
+    skipped_rows = 0
+    
+    # Resolve tag columns, column indices and SNMP authentication once rather than for every row
+    plan = build_instance_plan(columns, tag_columns, snmpv3_user, snmpv3_authprotocol, snmpv3_privprotocol)
+    
+    if jobs > 1:
+        # Imported here so serial runs don't pay for loading multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        executor_context = ProcessPoolExecutor(max_workers=jobs)
+    else:
+        executor_context = nullcontext()
+    
+    with executor_context as executor:
+        if executor is None:
+            results = (build_instance(row, plan) for row in configs)
+        else:
+            # Keep enough chunks in flight to keep every worker busy
+            results = build_instances_parallel(executor, configs, plan, 2 * jobs)
         
-        instances.append(instance)
+        for instance in results:
+            if instance is None:
+                skipped_rows += 1
+                continue
+            yield instance
     
     if skipped_rows > 0:
         print(f"Skipped {skipped_rows} rows due to missing IP_Address", file=sys.stderr)
+
+@lru_cache(maxsize=None)
+def get_yaml_dumper():
+    """Import PyYAML on first use and return the LibYAML based dumper when available."""
+    try:
+        from yaml import CSafeDumper as dumper
+    except ImportError:
+        from yaml import SafeDumper as dumper
+    return dumper
+
+def dump_instance(instance, stream):
+    """Write a single instance as an item of the instances list using the YAML library."""
+    import yaml
     
-    config = {
-        'init_config': {
-            'loader': 'core',
-            'use_device_id_as_hostname': True
-        },
-        'instances': instances
-    }
-    return config
+    yaml.dump([instance], stream, Dumper=get_yaml_dumper(), default_flow_style=False, sort_keys=False, allow_unicode=True)
+
+@lru_cache(maxsize=4096)
+def is_plain_scalar(value):
+    """Check whether a string or integer is written by the YAML library as a plain, single line scalar."""
+    if isinstance(value, int):
+        return True
+    
+    import yaml
+    
+    # Plain scalars without spaces are never wrapped, so they are written as is
+    return bool(PLAIN_SCALAR.fullmatch(value) and not value.endswith(':') and
+                yaml.resolver.Resolver().resolve(yaml.ScalarNode, value, (True, False)) == yaml.resolver.BaseResolver.DEFAULT_SCALAR_TAG)
 
-def write_yaml_file(config, output_path):
+def write_instance(instance, stream):
+    """Write a single instance as an item of the instances list.
+
+    Instances only contain string and integer values, plus lists of strings,
+    so they can be written directly instead of going through the YAML library.
+    Instances with values that need quoting are written with dump_instance instead.
+    """
+    lines = []
+    prefix = '- '
+    for key, value in instance.items():
+        if not isinstance(value, list):
+            if not is_plain_scalar(value):
+                dump_instance(instance, stream)
+                return
+            lines.append(f"{prefix}{key}: {value}\n")
+        elif value:
+            if not all(is_plain_scalar(item) for item in value):
+                dump_instance(instance, stream)
+                return
+            lines.append(f"{prefix}{key}:\n")
+            lines.extend(f"  - {item}\n" for item in value)
+        else:
+            lines.append(f"{prefix}{key}: []\n")
+        prefix = '  '
+    stream.write(''.join(lines))
+
+def write_config(init_config, instances, stream, safe_yaml=False):
+    """Write the configuration to a stream, emitting one instance at a time.
+
+    If safe_yaml is set, instances are written with the YAML library instead of write_instance.
+    """
+    import yaml
+    
+    yaml.dump({'init_config': init_config}, stream, Dumper=get_yaml_dumper(), default_flow_style=False, sort_keys=False, allow_unicode=True)
+    
+    instance = next(instances, None)
+    if instance is None:
+        stream.write('instances: []\n')
+        return
+    
+    stream.write('instances:\n')
+    while instance is not None:
+        if safe_yaml:
+            dump_instance(instance, stream)
+        else:
+            write_instance(instance, stream)
+        instance = next(instances, None)
+
+def write_yaml_file(init_config, instances, output_path, safe_yaml=False):
     """Write the configuration to a YAML file."""
     # Create output directory if it doesn't exist
     output_dir = os.path.dirname(output_path)
@@ -279,24 +522,39 @@ def write_yaml_file(config, output_path):
             print("Operation cancelled.")
             sys.exit(0)
     
-    with open(output_path, 'w') as f:
-        yaml.dump(config, f, default_flow_style=False, sort_keys=False, allow_unicode=True)
+    # Rows are read while the file is written, so write to a temporary file first
+    # to avoid leaving a partial configuration behind if reading the CSV fails
+    with tempfile.NamedTemporaryFile('w', dir=output_dir or '.', prefix=f".{os.path.basename(output_path)}.", suffix='.tmp', delete=False) as f:
+        temp_path = f.name
+        try:
+            write_config(init_config, instances, f, safe_yaml)
+        except BaseException:
+            f.close()
+            os.remove(temp_path)
+            raise
+    
+    # Temporary files are only readable by the owner, so apply the permissions
+    # a newly created file would get before moving it into place
+    umask = os.umask(0)
+    os.umask(umask)
+    os.chmod(temp_path, 0o666 & ~umask)
+    os.replace(temp_path, output_path)
     print(f"Configuration written to {output_path}")
 
 def main():
     args = parse_arguments()
     
     # Read and process CSV file
-    configs = read_csv_file(args.csv_file)
+    configs, columns = read_csv_file(args.csv_file, args.encoding)
     
-    # Generate configuration with multiple instances
-    config = generate_multi_instance_config(configs, args.user, args.authprotocol, args.privprotocol, args.tag_columns)
+    # Generate instances lazily so only one row is held in memory at a time
+    instances = generate_instances(configs, columns, args.user, args.authprotocol, args.privprotocol, args.tag_columns, args.jobs)
     
     if args.output:
         output_path = args.output
-        write_yaml_file(config, output_path)
+        write_yaml_file(INIT_CONFIG, instances, output_path, args.safe_yaml)
     else:  # If no output file, print YAML to stdout
-        print(yaml.dump(config, default_flow_style=False, sort_keys=False, allow_unicode=True))
+        write_config(INIT_CONFIG, instances, sys.stdout, args.safe_yaml)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,72 @@
+import csv
+import io
+import os
+import tempfile
+import unittest
+
+import migrate
+
+# Values that need quoting, wrapping or special handling in YAML
+TRICKY_VALUES = [
+    '', 'yes', 'No', 'null', '~', '1:20', '1_000', '0x1F', '.inf', '-.5', '2001-01-01',
+    '-', '---', '...', 'a: b', '#x', 'x #y', '-a', ':a', 'a:', 'caption::', "'q", '"d',
+    '@x', '*a', '&a', '!a', '?x', 'Zürich', 'New York', 'a\nb', 'a b', 'tab\tx',
+    'a' * 200, 'b ' * 60, "'quoted' " * 20,
+]
+
+
+def write_both(instances):
+    """Write instances with the built-in writer and the YAML library."""
+    outputs = []
+    for safe_yaml in (False, True):
+        stream = io.StringIO()
+        migrate.write_config(migrate.INIT_CONFIG, iter(instances), stream, safe_yaml)
+        outputs.append(stream.getvalue())
+    return outputs
+
+
+class WriteConfigTest(unittest.TestCase):
+    def test_tricky_values_match_safe_yaml(self):
+        instances = [
+            {
+                'ip_address': value,
+                'port': 161,
+                'snmp_version': 3,
+                'user': value,
+                'tags': [value, f"caption:{value}"],
+                'min_collection_interval': 60,
+            }
+            for value in TRICKY_VALUES
+        ]
+        for instance in instances:
+            written, dumped = write_both([instance])
+            self.assertEqual(written, dumped, repr(instance['ip_address']))
+
+    def test_empty_instances_match_safe_yaml(self):
+        written, dumped = write_both([])
+        self.assertEqual(written, dumped)
+
+        written, dumped = write_both([{'ip_address': '10.0.0.1', 'port': 161, 'tags': []}])
+        self.assertEqual(written, dumped)
+
+    def test_csv_rows_match_safe_yaml(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            csv_path = os.path.join(tmp_dir, 'Nodes.csv')
+            with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(['Caption', 'IP_Address', 'ObjectSubType', 'SNMPVersion', 'AgentPort', 'PollInterval', 'Location'])
+                for i, value in enumerate(TRICKY_VALUES * 20):
+                    writer.writerow([f"node {value}", f"10.0.{i // 250}.{i % 250}", 'SNMP', str(i % 4), '161', str(i % 300), value])
+
+            outputs = []
+            for safe_yaml in (False, True):
+                rows, columns = migrate.read_csv_file(csv_path, 'utf-8')
+                stream = io.StringIO()
+                migrate.write_config(migrate.INIT_CONFIG, migrate.generate_instances(rows, columns), stream, safe_yaml)
+                outputs.append(stream.getvalue())
+
+        self.assertEqual(outputs[0], outputs[1])
+
+
+if __name__ == '__main__':
+    unittest.main()